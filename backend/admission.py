@@ -0,0 +1,381 @@
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from database import DB_POOL_CAPACITY
+
+# Admission control for /api routes.
+#
+# Every route belongs to a priority class. Each class has its own concurrency
+# lane, so cheap critical reads never queue behind a storm of uploads, and a
+# bounded FIFO queue with a deadline: requests that can't start in time are
+# shed with 503 + Retry-After instead of piling up on the DB pool. Classes can
+# also carry a per-user token bucket that answers 429 when exceeded.
+#
+# Lanes are sized from the DB pool: DEFAULT and BULK together can never hold
+# every connection, so critical reads don't wait in the pool queue behind
+# writes. Expensive routes additionally get their own per-route cap.
+#
+# State is per process; with several workers each one enforces its own limits.
+
+CRITICAL = "critical"
+DEFAULT = "default"
+BULK = "bulk"
+
+
+class PriorityClass:
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        # Per-user token bucket: `rate` tokens/s refilled up to `burst`
+        self.rate = rate
+        self.burst = burst
+
+
+# Each admitted request holds at most one pooled connection (one session)
+CRITICAL_RESERVED = max(2, DB_POOL_CAPACITY // 4)
+_SHARED = max(2, DB_POOL_CAPACITY - CRITICAL_RESERVED)
+BULK_CONCURRENCY = max(1, _SHARED // 3)
+DEFAULT_CONCURRENCY = _SHARED - BULK_CONCURRENCY
+
+PRIORITY_CLASSES = {
+    CRITICAL: PriorityClass(CRITICAL, max_concurrency=DB_POOL_CAPACITY, max_queue=256, queue_timeout=2.0),
+    DEFAULT: PriorityClass(DEFAULT, max_concurrency=DEFAULT_CONCURRENCY, max_queue=128, queue_timeout=1.0, rate=20, burst=40),
+    BULK: PriorityClass(BULK, max_concurrency=BULK_CONCURRENCY, max_queue=64, queue_timeout=0.5, rate=5, burst=20),
+}
+
+# (method, route path) -> class. Unlisted GETs are DEFAULT, other methods BULK.
+ROUTE_PRIORITIES = {
+    ("GET", "/api/profile/{userId}"): CRITICAL,
+    ("POST", "/api/auth/login"): CRITICAL,
+    ("GET", "/api/workouts/today/{userId}"): CRITICAL,
+    ("GET", "/api/search"): BULK,
+}
+
+# (method, route path) -> max concurrent requests, on top of the class lane
+ROUTE_LIMITS = {
+    ("GET", "/api/search"): max(1, BULK_CONCURRENCY // 2),
+}
+
+# Never admission-controlled, so the metrics stay readable under overload
+EXEMPT_ROUTES = {("GET", "/api/metrics/admission")}
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_CONTROL", "1") != "0"
+
+# JSON bodies up to this size are inspected for a `userId` to rate limit on
+MAX_IDENTITY_BODY = 64 * 1024
+
+
+class Lane:
+    """A concurrency limit with a bounded FIFO queue and per-waiter deadline."""
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Take a slot, waiting at most `timeout` (default: the lane's queue
+        timeout). Returns None on success, otherwise the reason it was shed.
+        """
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            return "queue_full"
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        timer = loop.call_later(self.queue_timeout if timeout is None else timeout, self._expire, waiter)
+        try:
+            granted = await waiter
+        except asyncio.CancelledError:
+            # Client went away while queued. If a slot was already handed
+            # to us, pass it on; an expired waiter never held one.
+            if waiter.done() and not waiter.cancelled() and waiter.result():
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+        finally:
+            timer.cancel()
+        return None if granted else "timeout"
+
+    def _expire(self, waiter: asyncio.Future) -> None:
+        if not waiter.done():
+            self._waiters.remove(waiter)
+            waiter.set_result(False)
+
+    def release(self) -> None:
+        # Hand the slot straight to the next waiter rather than freeing it,
+        # so a newcomer can't grab it ahead of the queue.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+
+class TokenBuckets:
+    """In-memory per-key token buckets. Idle buckets are pruned once full."""
+
+    PRUNE_EVERY = 1024
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._inserts = 0
+
+    def take(self, key: str, now: Optional[float] = None) -> float:
+        """Consume one token. Returns 0 if allowed, else seconds until a token is available."""
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = self.burst
+            self._inserts += 1
+            if self._inserts % self.PRUNE_EVERY == 0:
+                self._prune(now)
+        else:
+            tokens, last = bucket
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / self.rate
+        self._buckets[key] = (tokens - 1, now)
+        return 0.0
+
+    def _prune(self, now: float) -> None:
+        full_after = self.burst / self.rate
+        self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < full_after}
+
+
+class AdmissionMetrics:
+    def __init__(self, classes: Dict[str, PriorityClass]):
+        self.admitted: Dict[str, int] = {name: 0 for name in classes}
+        self.shed: Dict[str, Dict[str, int]] = {
+            name: {"queue_full": 0, "timeout": 0, "rate_limited": 0} for name in classes
+        }
+        self.queue_wait_seconds: Dict[str, float] = {name: 0.0 for name in classes}
+
+
+def _retry_after(seconds: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+class AdmissionController:
+    """Lanes, rate limiters and counters shared by the middleware and the metrics route."""
+
+    def __init__(
+        self,
+        classes: Dict[str, PriorityClass] = PRIORITY_CLASSES,
+        route_limits: Dict[Tuple[str, str], int] = ROUTE_LIMITS,
+    ):
+        self.classes = classes
+        self.lanes = {
+            name: Lane(c.max_concurrency, c.max_queue, c.queue_timeout) for name, c in classes.items()
+        }
+        # Route lanes get their deadline from the request's class at acquire time
+        self.route_lanes = {
+            route: Lane(limit, max_queue=64, queue_timeout=0) for route, limit in route_limits.items()
+        }
+        self.buckets = {
+            name: TokenBuckets(c.rate, c.burst) for name, c in classes.items() if c.rate
+        }
+        self.metrics = AdmissionMetrics(classes)
+
+    def snapshot(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "classes": {
+                name: {
+                    "active": self.lanes[name].active,
+                    "queued": self.lanes[name].queued,
+                    "maxConcurrency": c.max_concurrency,
+                    "admitted": self.metrics.admitted[name],
+                    "shed": dict(self.metrics.shed[name]),
+                    "queueWaitSeconds": round(self.metrics.queue_wait_seconds[name], 3),
+                }
+                for name, c in self.classes.items()
+            },
+            "routes": {
+                f"{method} {path}": {
+                    "active": lane.active,
+                    "queued": lane.queued,
+                    "maxConcurrency": lane.limit,
+                }
+                for (method, path), lane in self.route_lanes.items()
+            },
+        }
+
+
+admission_controller = AdmissionController()
+
+
+class AdmissionControlMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        controller: AdmissionController = admission_controller,
+        prefix: str = "/api",
+        enabled: bool = ADMISSION_ENABLED,
+    ) -> None:
+        self.app = app
+        self.controller = controller
+        self.prefix = prefix
+        self.enabled = enabled
+
+    def classify(self, scope: Scope) -> Tuple[Optional[str], Optional[Tuple[str, str]], Dict[str, str]]:
+        """Return (priority class or None if exempt, route key, path params) for a request."""
+        method = scope["method"]
+        for route in scope["app"].router.routes:
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                route_key = (method, getattr(route, "path", scope["path"]))
+                if route_key in EXEMPT_ROUTES:
+                    return None, None, {}
+                default = DEFAULT if method in ("GET", "HEAD") else BULK
+                return ROUTE_PRIORITIES.get(route_key, default), route_key, child_scope.get("path_params", {})
+        # Unknown route: let the router answer 404/405 without queueing
+        return None, None, {}
+
+    @staticmethod
+    async def read_json_user_id(scope: Scope, receive: Receive) -> Tuple[Optional[str], Receive]:
+        """
+        Read a small JSON body to find its `userId`. Returns the id (if any) and
+        a receive callable that replays the consumed messages to the app.
+        """
+        headers = Headers(scope=scope)
+        try:
+            length = int(headers.get("content-length", ""))
+        except ValueError:
+            return None, receive
+        if length > MAX_IDENTITY_BODY or not headers.get("content-type", "").startswith("application/json"):
+            return None, receive
+
+        messages: List[Message] = []
+        body = b""
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            body += message.get("body", b"")
+            if not message.get("more_body", False):
+                break
+
+        pending = deque(messages)
+
+        async def replay() -> Message:
+            return pending.popleft() if pending else await receive()
+
+        try:
+            user_id = json.loads(body).get("userId")
+        except (ValueError, AttributeError):
+            user_id = None
+        return (str(user_id) if user_id else None), replay
+
+    async def client_key(
+        self, scope: Scope, receive: Receive, path_params: Dict[str, str]
+    ) -> Tuple[str, Receive]:
+        """
+        Identify who a request is rate limited as: the `userId` path param, else
+        a `userId` in the JSON body of writes, else the client IP. Behind a
+        proxy the IP comes from X-Forwarded-For (gunicorn's
+        forwarded_allow_ips), not the proxy's own address.
+        """
+        if "userId" in path_params:
+            return f"user:{path_params['userId']}", receive
+        if scope["method"] not in ("GET", "HEAD"):
+            user_id, receive = await self.read_json_user_id(scope, receive)
+            if user_id:
+                return f"user:{user_id}", receive
+        client = scope.get("client")
+        return (f"ip:{client[0]}" if client else "anonymous"), receive
+
+    def overloaded(self, retry_after: float) -> JSONResponse:
+        return JSONResponse(
+            {"detail": "Server is overloaded, please retry"},
+            status_code=503,
+            headers=_retry_after(retry_after),
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.enabled or scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        priority, route_key, path_params = self.classify(scope)
+        if priority is None:
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.controller
+        shed = controller.metrics.shed[priority]
+        buckets = controller.buckets.get(priority)
+        if buckets is not None:
+            key, receive = await self.client_key(scope, receive, path_params)
+            wait = buckets.take(key)
+            if wait:
+                shed["rate_limited"] += 1
+                response = JSONResponse({"detail": "Rate limit exceeded"}, status_code=429, headers=_retry_after(wait))
+                await response(scope, receive, send)
+                return
+
+        lane = controller.lanes[priority]
+        route_lane = controller.route_lanes.get(route_key)
+        queued_at = time.monotonic()
+        deadline = queued_at + lane.queue_timeout
+
+        # Per-route cap first, so a request waiting on it doesn't hold a class slot
+        if route_lane is not None:
+            reason = await route_lane.acquire(timeout=lane.queue_timeout)
+            if reason is not None:
+                shed[reason] += 1
+                await self.overloaded(lane.queue_timeout)(scope, receive, send)
+                return
+
+        try:
+            reason = await lane.acquire(timeout=max(0.0, deadline - time.monotonic()))
+            if reason is not None:
+                shed[reason] += 1
+                await self.overloaded(lane.queue_timeout)(scope, receive, send)
+                return
+
+            controller.metrics.admitted[priority] += 1
+            controller.metrics.queue_wait_seconds[priority] += time.monotonic() - queued_at
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                lane.release()
+        finally:
+            if route_lane is not None:
+                route_lane.release()
@@ -0,0 +1,137 @@
+"""
+Throughput scaling benchmark for the multi-worker serving mode.
+
+Starts gunicorn (gunicorn.conf.py) with 1, 2, 4, ... workers up to the number
+of cores, drives it with concurrent keep-alive clients and prints requests/s
+and the speedup over a single worker.
+
+    uv run python benchmarks/bench_workers.py --path /api/workouts --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Tuple
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def worker_counts(max_workers: int):
+    n = 1
+    while n < max_workers:
+        yield n
+        n *= 2
+    yield max_workers
+
+
+async def wait_until_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+async def drive(url: str, concurrency: int, duration: float) -> Tuple[int, int, str]:
+    """Returns (successful requests, failed requests, first failure)."""
+    done = 0
+    failed = 0
+    first_error = ""
+    stop_at = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+        async def loop():
+            nonlocal done, failed, first_error
+            while time.monotonic() < stop_at:
+                try:
+                    response = await client.get(url)
+                    response.raise_for_status()
+                except httpx.HTTPError as exc:
+                    failed += 1
+                    first_error = first_error or f"{type(exc).__name__}: {exc}"
+                else:
+                    done += 1
+
+        await asyncio.gather(*(loop() for _ in range(concurrency)))
+    return done, failed, first_error
+
+
+def run_client(url: str, concurrency: int, duration: float, result, failures, errors):
+    result.value, failures.value, error = asyncio.run(drive(url, concurrency, duration))
+    if error:
+        errors.put(error)
+
+
+def measure(url: str, clients: int, concurrency: int, duration: float) -> Tuple[float, int, str]:
+    """Returns (successful req/s, failed requests, first failure)."""
+    # One client process per core so the load generator isn't the bottleneck
+    ctx = multiprocessing.get_context("spawn")
+    results = [ctx.Value("q", 0) for _ in range(clients)]
+    failures = [ctx.Value("q", 0) for _ in range(clients)]
+    errors = ctx.Queue()
+    procs = [
+        ctx.Process(target=run_client, args=(url, concurrency, duration, r, f, errors))
+        for r, f in zip(results, failures)
+    ]
+    start = time.monotonic()
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    elapsed = time.monotonic() - start
+    crashed = sum(1 for p in procs if p.exitcode != 0)
+    first_error = "" if errors.empty() else errors.get()
+    if crashed and not first_error:
+        first_error = f"{crashed} client process(es) exited abnormally"
+    return sum(r.value for r in results) / elapsed, sum(f.value for f in failures) + crashed, first_error
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default="/api/workouts")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=32, help="connections per client process")
+    parser.add_argument("--clients", type=int, default=max(1, multiprocessing.cpu_count() // 2))
+    parser.add_argument("--max-workers", type=int, default=multiprocessing.cpu_count())
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}{args.path}"
+    baseline = None
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8}")
+    for workers in worker_counts(args.max_workers):
+        # All load comes from one IP, so per-client rate limits would cap it
+        env = dict(os.environ, PORT=str(args.port), WEB_CONCURRENCY=str(workers), ADMISSION_CONTROL="0")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning", "main:app"],
+            cwd=BACKEND_DIR,
+            env=env,
+        )
+        try:
+            asyncio.run(wait_until_ready(url))
+            # Warm caches and connections before measuring
+            measure(url, args.clients, args.concurrency, 1.0)
+            rps, failed, first_error = measure(url, args.clients, args.concurrency, args.duration)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+        if failed or not rps:
+            # Failed requests would make the throughput numbers meaningless
+            sys.exit(f"{workers} worker(s): {failed} failed request(s), {rps:.0f} req/s succeeded. First failure: {first_error or 'none'}")
+        baseline = baseline or rps
+        print(f"{workers:>8} {rps:>10.0f} {rps / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
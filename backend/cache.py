@@ -0,0 +1,86 @@
+import multiprocessing
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+# Every cached namespace gets a slot in a shared generation counter.
+# Bumping a slot invalidates that namespace in every worker at once.
+NAMESPACES = (
+    "workouts",
+    "strength_routines",
+    "nutrition_tips",
+    "challenges",
+)
+
+DEFAULT_TTL = 300.0
+# Some keys come from request parameters (e.g. the nutrition tip category),
+# so the number of entries per process is capped.
+DEFAULT_MAX_ENTRIES = 256
+
+# Allocated at import time. When the app is preloaded (gunicorn --preload) this
+# happens once in the master, and forked workers inherit the same shared memory.
+_generations = multiprocessing.Array("Q", len(NAMESPACES), lock=True)
+_slots = {name: i for i, name in enumerate(NAMESPACES)}
+
+
+def generation(namespace: str) -> int:
+    # Aligned 64-bit reads don't need the lock; writers only ever increment
+    return _generations.get_obj()[_slots[namespace]]
+
+
+def invalidate(namespace: str) -> None:
+    """Invalidate a namespace in this and every other worker process."""
+    with _generations.get_lock():
+        _generations.get_obj()[_slots[namespace]] += 1
+
+
+class LocalCache:
+    """
+    Per-process TTL cache whose entries are tagged with the namespace's shared
+    generation. An entry is only returned while its generation is current, so
+    a write in any worker is seen by all workers on their next read.
+    Holds at most `max_entries`, evicting the least recently used.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[int, float, Any]]" = OrderedDict()
+
+    def get(self, namespace: str, key: Hashable = None) -> Optional[Any]:
+        entry = self._entries.get((namespace, key))
+        if entry is None:
+            return None
+        gen, expires_at, value = entry
+        if gen != generation(namespace) or expires_at < time.monotonic():
+            self._entries.pop((namespace, key), None)
+            return None
+        self._entries.move_to_end((namespace, key))
+        return value
+
+    def set(self, namespace: str, value: Any, key: Hashable = None, generation_at_read: Optional[int] = None) -> None:
+        # Callers pass the generation observed before querying the DB, so a
+        # concurrent invalidation during the query makes the entry stale.
+        gen = generation(namespace) if generation_at_read is None else generation_at_read
+        now = time.monotonic()
+        self._entries[(namespace, key)] = (gen, now + self.ttl, value)
+        self._entries.move_to_end((namespace, key))
+        if len(self._entries) > self.max_entries:
+            self._prune(now)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _prune(self, now: float) -> None:
+        # Drop expired and superseded entries before evicting live ones
+        for entry_key, (gen, expires_at, _) in list(self._entries.items()):
+            if expires_at < now or gen != generation(entry_key[0]):
+                del self._entries[entry_key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+cache = LocalCache()
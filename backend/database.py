@@ -1,4 +1,5 @@
 import os
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from dotenv import load_dotenv
@@ -14,11 +15,17 @@ if DATABASE_URL.startswith("postgres://"):
 elif DATABASE_URL.startswith("postgresql://"):
     DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
 
+# Connection pool per worker process. admission.py sizes its concurrency lanes
+# from DB_POOL_CAPACITY so that some connections stay free for critical reads.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_CAPACITY = DB_POOL_SIZE + DB_MAX_OVERFLOW
+
 engine = create_async_engine(
     DATABASE_URL,
     echo=True,
-    # SQLite doesn't support pool_size, but Postgres does. 
-    # We can handle SQLite specific args if needed.
+    # In-memory SQLite uses a single static connection and doesn't take pool sizes
+    **({} if make_url(DATABASE_URL).database in (None, "", ":memory:") else {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW}),
     connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
 )
 
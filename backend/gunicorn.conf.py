@@ -0,0 +1,77 @@
+# Multi-worker serving: gunicorn -c gunicorn.conf.py main:app
+import asyncio
+import math
+import os
+
+MAX_DEFAULT_WORKERS = 4
+
+
+def available_cpus() -> int:
+    """CPUs this container may actually use: affinity capped by the cgroup quota."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                quota = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if quota > 0:
+                cpus = min(cpus, math.ceil(quota / period))
+        except (OSError, ValueError):
+            pass
+    return max(1, cpus)
+
+
+def default_workers() -> int:
+    # SQLite allows a single writer; several processes would hit "database is locked"
+    if "sqlite" in os.getenv("DATABASE_URL", "sqlite"):
+        return 1
+    return min(available_cpus(), MAX_DEFAULT_WORKERS)
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# WEB_CONCURRENCY (set by Render and most PaaS) always wins
+workers = int(os.getenv("WEB_CONCURRENCY") or default_workers())
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Import the app once in the master so workers fork with it (and the shared
+# cache generations in cache.py) already loaded.
+preload_app = True
+
+# Trust X-Forwarded-For only from these proxies so request.client is the real
+# caller (admission.py rate limits per client). "*" would let any client pick
+# its own rate-limit key via a spoofed header, so set this to the fronting
+# proxy's addresses (comma-separated IPs or CIDRs) in each deployment.
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+keepalive = 5
+graceful_timeout = 30
+
+
+def on_starting(server):
+    # Create and seed the schema once, before any worker exists
+    from main import DB_INITIALIZED_ENV, init_db
+    from database import engine
+
+    async def init():
+        await init_db()
+        # The connections were opened on the master's loop; close them so
+        # workers don't inherit them.
+        await engine.dispose()
+
+    asyncio.run(init())
+    os.environ[DB_INITIALIZED_ENV] = "1"
+
+
+def post_fork(server, worker):
+    # Never share pooled connections across processes
+    from database import engine
+
+    engine.sync_engine.dispose(close=False)
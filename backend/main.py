@@ -1,5 +1,4 @@
-from fastapi import FastAPI, HTTPException, Body, Depends
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, HTTPException, Body, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
@@ -7,6 +6,7 @@ from typing import List, Optional
 from datetime import datetime, timedelta
 import uuid
 import random
+import os
 
 from models import (
     User as PydanticUser, UserProfile as PydanticUserProfile, 
@@ -14,13 +14,24 @@ from models import (
     TrainingPlan as PydanticTrainingPlan, Workout as PydanticWorkout, 
     Challenge as PydanticChallenge, LeaderboardEntry as PydanticLeaderboardEntry, 
     NutritionTip as PydanticNutritionTip, StrengthRoutine as PydanticStrengthRoutine, 
-    CoachMessage
+    CoachMessage, SearchResult as PydanticSearchResult, SearchResponse as PydanticSearchResponse
 )
 from models_db import Base, DBUser, DBUserProfile, DBStressEntry, DBWorkout, DBTrainingPlan, DBChallenge, DBNutritionTip, DBStrengthRoutine
 from database import engine, get_db
+from serving import PrecompressedStaticFiles, APIGZipMiddleware
+from cache import cache, generation, invalidate
+from search import SEARCH_KINDS, search_catalog
+from admission import AdmissionControlMiddleware, admission_controller
+
+# Set by the gunicorn master once it has created and seeded the schema
+DB_INITIALIZED_ENV = "RUNAI_DB_INITIALIZED"
 
 app = FastAPI(title="RunAI API")
 
+# Sheds overload with 429/503 + Retry-After. Added before CORS so that
+# rejections still carry CORS headers and the browser can read them.
+app.add_middleware(AdmissionControlMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -29,14 +40,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.on_event("startup")
-async def startup():
-    async with engine.begin() as conn:
+# Compress large JSON API payloads; static assets are precompressed at build time
+app.add_middleware(APIGZipMiddleware, minimum_size=1024, compresslevel=6)
+
+async def init_db(db_engine=engine):
+    async with db_engine.begin() as conn:
         # Create tables
         await conn.run_sync(Base.metadata.create_all)
     
     # Optional: Seed initial data if needed
-    async with AsyncSession(engine) as session:
+    async with AsyncSession(db_engine) as session:
         result = await session.execute(select(DBNutritionTip).limit(1))
         if not result.scalars().first():
             # Seed some data
@@ -50,6 +63,16 @@ async def startup():
             ]
             session.add_all(tips + workouts)
             await session.commit()
+            invalidate("nutrition_tips")
+            invalidate("workouts")
+
+@app.on_event("startup")
+async def startup():
+    # In multi-worker mode the gunicorn master runs init_db() once before forking
+    # (see gunicorn.conf.py), so workers must not race each other re-seeding.
+    if os.getenv(DB_INITIALIZED_ENV) == "1":
+        return
+    await init_db()
 
 # Helper to convert DB model to Pydantic
 def user_db_to_pydantic(db_user: DBUser) -> PydanticUser:
@@ -240,6 +263,7 @@ async def complete_workout(workoutId: str, data: dict = Body(...), db: AsyncSess
     w.actualDistance = data.get("distance")
     w.actualDuration = data.get("duration")
     await db.commit()
+    invalidate("workouts")
     await db.refresh(w)
     return PydanticWorkout(
         id=w.id, type=w.type, title=w.title, description=w.description,
@@ -250,42 +274,90 @@ async def complete_workout(workoutId: str, data: dict = Body(...), db: AsyncSess
 
 @app.get("/api/workouts", response_model=List[PydanticWorkout])
 async def get_workouts(db: AsyncSession = Depends(get_db)):
+    cached = cache.get("workouts")
+    if cached is not None:
+        return cached
+    gen = generation("workouts")
     result = await db.execute(select(DBWorkout))
     db_ws = result.scalars().all()
-    return [PydanticWorkout(
+    workouts = [PydanticWorkout(
         id=w.id, type=w.type, title=w.title, description=w.description,
         duration=w.duration, distance=w.distance, targetPace=w.targetPace,
         intervals=w.intervals, completed=w.completed, completedAt=w.completedAt.isoformat() if w.completedAt else None,
         actualDistance=w.actualDistance, actualDuration=w.actualDuration
     ) for w in db_ws]
+    cache.set("workouts", workouts, generation_at_read=gen)
+    return workouts
 
 @app.get("/api/strength-routines", response_model=List[PydanticStrengthRoutine])
 async def get_strength_routines(db: AsyncSession = Depends(get_db)):
+    cached = cache.get("strength_routines")
+    if cached is not None:
+        return cached
+    gen = generation("strength_routines")
     result = await db.execute(select(DBStrengthRoutine))
     db_sr = result.scalars().all()
-    return [PydanticStrengthRoutine(
+    routines = [PydanticStrengthRoutine(
         id=w.id, name=w.name, duration=w.duration, difficulty=w.difficulty,
         exercises=w.exercises, targetAreas=w.targetAreas
     ) for w in db_sr]
+    cache.set("strength_routines", routines, generation_at_read=gen)
+    return routines
 
 @app.get("/api/nutrition-tips", response_model=List[PydanticNutritionTip])
 async def get_nutrition_tips(category: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    cached = cache.get("nutrition_tips", category)
+    if cached is not None:
+        return cached
+    gen = generation("nutrition_tips")
     if category:
         result = await db.execute(select(DBNutritionTip).where(DBNutritionTip.category == category))
     else:
         result = await db.execute(select(DBNutritionTip))
     db_tips = result.scalars().all()
-    return [PydanticNutritionTip(id=t.id, category=t.category, title=t.title, content=t.content, timing=t.timing) for t in db_tips]
+    tips = [PydanticNutritionTip(id=t.id, category=t.category, title=t.title, content=t.content, timing=t.timing) for t in db_tips]
+    cache.set("nutrition_tips", tips, key=category, generation_at_read=gen)
+    return tips
+
+@app.get("/api/search", response_model=PydanticSearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    types: Optional[List[str]] = Query(None),
+    difficulty: Optional[str] = None,
+    targetAreas: Optional[List[str]] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db)
+):
+    unknown = set(types or []) - set(SEARCH_KINDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown search types: {', '.join(sorted(unknown))}")
+    rows, total = await search_catalog(
+        db, q, kinds=types, difficulty=difficulty, target_areas=targetAreas, limit=limit, offset=offset
+    )
+    return PydanticSearchResponse(
+        results=[PydanticSearchResult(
+            type=r["kind"], id=r["item_id"], title=r["title"], snippet=r["snippet"],
+            score=r["score"], difficulty=r["difficulty"]
+        ) for r in rows],
+        total=total, limit=limit, offset=offset
+    )
 
 @app.get("/api/challenges", response_model=List[PydanticChallenge])
 async def get_challenges(db: AsyncSession = Depends(get_db)):
+    cached = cache.get("challenges")
+    if cached is not None:
+        return cached
+    gen = generation("challenges")
     result = await db.execute(select(DBChallenge))
     db_cs = result.scalars().all()
-    return [PydanticChallenge(
+    challenges = [PydanticChallenge(
         id=c.id, title=c.title, description=c.description, type=c.type,
         target=c.target, unit=c.unit, startDate=c.startDate, endDate=c.endDate,
         participants=c.participants, userProgress=0
     ) for c in db_cs]
+    cache.set("challenges", challenges, generation_at_read=gen)
+    return challenges
 
 @app.get("/api/leaderboard", response_model=List[PydanticLeaderboardEntry])
 async def get_leaderboard(type: str = "weekly"):
@@ -295,6 +367,10 @@ async def get_leaderboard(type: str = "weekly"):
         PydanticLeaderboardEntry(rank=2, userId="u2", userName="Bob", value=115, unit="km")
     ]
 
+@app.get("/api/metrics/admission")
+async def get_admission_metrics():
+    return admission_controller.snapshot()
+
 @app.get("/api/coach/message", response_model=CoachMessage)
 async def get_coach_message(workoutCompleted: bool = False, stressLevel: int = 3):
     messages = [
@@ -342,9 +418,8 @@ async def upgrade_subscription(userId: str = Body(..., embed=True), db: AsyncSes
 
 # Serve static files
 # This should be at the end to avoid catching API routes
-import os
 static_dir = os.path.join(os.path.dirname(__file__), ".." , "frontend", "dist")
 if os.path.exists(static_dir):
-    app.mount("/", StaticFiles(directory=static_dir, html=True), name="static")
+    app.mount("/", PrecompressedStaticFiles(directory=static_dir, html=True), name="static")
 else:
     print(f"Warning: Static directory {static_dir} not found.")
@@ -103,3 +103,17 @@ class CoachMessage(BaseModel):
     type: Literal['motivation', 'tip', 'feedback', 'warning']
     content: str
     createdAt: str
+
+class SearchResult(BaseModel):
+    type: Literal['nutrition', 'strength', 'workout']
+    id: str
+    title: str
+    snippet: str
+    score: float
+    difficulty: Optional[Literal['easy', 'medium', 'hard']] = None
+
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
+    total: int
+    limit: int
+    offset: int
@@ -0,0 +1,306 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, inspect, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models_db import Base, DBNutritionTip, DBStrengthRoutine, DBWorkout
+
+# Search index over the content catalogs.
+#
+# SQLite: an FTS5 table (porter stemming, 2/3-char prefix indexes) whose rowid
+# is keyed by `search_documents`, which also holds the filterable columns.
+# `difficulty` is deliberately unindexed: an index there lures the planner
+# into probing the FTS table row by row instead of running MATCH first.
+# Target areas are also kept there as a JSON array so the targetAreas filter
+# is an exact match on both backends, not a stemmed token match.
+# PostgreSQL: one `search_index` table with a weighted tsvector and GIN index.
+#
+# Both are created with the rest of the schema (Base.metadata.create_all) and
+# kept in sync by ORM flush events, so every write path updates the index in
+# the same transaction.
+
+SEARCH_KINDS = {
+    "nutrition": DBNutritionTip,
+    "strength": DBStrengthRoutine,
+    "workout": DBWorkout,
+}
+
+# Attributes that build_document() reads; updates touching nothing else
+# (e.g. completing a workout) leave the index alone.
+INDEXED_ATTRIBUTES = {
+    "nutrition": ("title", "content", "category", "timing"),
+    "strength": ("name", "exercises", "targetAreas", "difficulty"),
+    "workout": ("title", "description", "type"),
+}
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+SNIPPET_WORDS = 16
+
+SQLITE_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS search_documents (
+        id INTEGER PRIMARY KEY,
+        kind TEXT NOT NULL,
+        item_id TEXT NOT NULL,
+        difficulty TEXT,
+        target_areas TEXT NOT NULL DEFAULT '[]',
+        UNIQUE (kind, item_id)
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        title, body, target_areas,
+        tokenize = 'porter unicode61',
+        prefix = '2 3'
+    )
+    """,
+)
+
+POSTGRES_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS search_index (
+        kind TEXT NOT NULL,
+        item_id TEXT NOT NULL,
+        difficulty TEXT,
+        title TEXT,
+        body TEXT,
+        target_areas TEXT[] NOT NULL DEFAULT '{}',
+        document TSVECTOR NOT NULL,
+        PRIMARY KEY (kind, item_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_search_index_document ON search_index USING GIN (document)",
+    "CREATE INDEX IF NOT EXISTS ix_search_index_target_areas ON search_index USING GIN (target_areas)",
+)
+
+
+def _is_postgres(connection) -> bool:
+    return connection.dialect.name == "postgresql"
+
+
+# Documents
+
+def normalize_areas(areas: Optional[Sequence[str]]) -> List[str]:
+    """Lower-case and trim target areas, dropping empty values."""
+    return [a for a in (str(area).strip().lower() for area in areas or []) if a]
+
+
+def _exercise_text(exercises: Any) -> str:
+    parts = []
+    for exercise in exercises or []:
+        if isinstance(exercise, dict):
+            parts.extend(str(v) for v in exercise.values() if isinstance(v, str))
+        elif isinstance(exercise, str):
+            parts.append(exercise)
+    return " ".join(parts)
+
+
+def build_document(kind: str, obj: Any) -> Dict[str, Any]:
+    """Flatten a catalog row (ORM object or Row) into indexable fields."""
+    if kind == "nutrition":
+        title = obj.title
+        body = " ".join(filter(None, [obj.content, obj.category, obj.timing]))
+        difficulty, target_areas = None, []
+    elif kind == "strength":
+        title = obj.name
+        body = _exercise_text(obj.exercises)
+        difficulty = obj.difficulty
+        target_areas = normalize_areas(obj.targetAreas)
+    else:
+        title = obj.title
+        body = " ".join(filter(None, [obj.description, obj.type]))
+        difficulty, target_areas = None, []
+    return {
+        "kind": kind,
+        "item_id": obj.id,
+        "difficulty": difficulty,
+        "title": title or "",
+        "body": body,
+        "target_areas": target_areas,
+    }
+
+
+def index_document(connection, doc: Dict[str, Any]) -> None:
+    if _is_postgres(connection):
+        connection.execute(text("""
+            INSERT INTO search_index (kind, item_id, difficulty, title, body, target_areas, document)
+            VALUES (:kind, :item_id, :difficulty, :title, :body, :target_areas,
+                setweight(to_tsvector('english', :title), 'A') ||
+                setweight(to_tsvector('english', :target_text), 'B') ||
+                setweight(to_tsvector('english', :body), 'C'))
+            ON CONFLICT (kind, item_id) DO UPDATE SET
+                difficulty = EXCLUDED.difficulty, title = EXCLUDED.title, body = EXCLUDED.body,
+                target_areas = EXCLUDED.target_areas, document = EXCLUDED.document
+        """), {**doc, "target_text": " ".join(doc["target_areas"])})
+        return
+
+    connection.execute(text("""
+        INSERT INTO search_documents (kind, item_id, difficulty, target_areas)
+        VALUES (:kind, :item_id, :difficulty, :target_json)
+        ON CONFLICT (kind, item_id) DO UPDATE SET
+            difficulty = excluded.difficulty, target_areas = excluded.target_areas
+    """), {**doc, "target_json": json.dumps(doc["target_areas"])})
+    rowid = connection.execute(
+        text("SELECT id FROM search_documents WHERE kind = :kind AND item_id = :item_id"), doc
+    ).scalar_one()
+    connection.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), {"rowid": rowid})
+    connection.execute(
+        text("INSERT INTO search_index (rowid, title, body, target_areas) VALUES (:rowid, :title, :body, :target_text)"),
+        {"rowid": rowid, "title": doc["title"], "body": doc["body"], "target_text": " ".join(doc["target_areas"])},
+    )
+
+
+def remove_document(connection, kind: str, item_id: str) -> None:
+    params = {"kind": kind, "item_id": item_id}
+    if _is_postgres(connection):
+        connection.execute(text("DELETE FROM search_index WHERE kind = :kind AND item_id = :item_id"), params)
+        return
+    rowid = connection.execute(
+        text("SELECT id FROM search_documents WHERE kind = :kind AND item_id = :item_id"), params
+    ).scalar()
+    if rowid is not None:
+        connection.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), {"rowid": rowid})
+        connection.execute(text("DELETE FROM search_documents WHERE id = :rowid"), {"rowid": rowid})
+
+
+def rebuild_search_index(connection) -> None:
+    """Re-index every catalog row, e.g. when the index is added to an existing database."""
+    for kind, model in SEARCH_KINDS.items():
+        for row in connection.execute(select(model.__table__)):
+            index_document(connection, build_document(kind, row))
+
+
+# Schema and sync hooks
+
+def create_search_index(target, connection, **kw) -> None:
+    if _is_postgres(connection):
+        existed = connection.execute(text("SELECT to_regclass('search_index') IS NOT NULL")).scalar()
+        ddl = POSTGRES_DDL
+    else:
+        existed = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'search_index'")
+        ).scalar() is not None
+        columns = {row[1] for row in connection.execute(text("PRAGMA table_info(search_documents)"))}
+        if existed and "target_areas" not in columns:
+            # Index built before target areas were stored; rebuild it
+            drop_search_index(target, connection)
+            existed = False
+        ddl = SQLITE_DDL
+    for statement in ddl:
+        connection.execute(text(statement))
+    if not existed:
+        rebuild_search_index(connection)
+
+
+def drop_search_index(target, connection, **kw) -> None:
+    connection.execute(text("DROP TABLE IF EXISTS search_index"))
+    if not _is_postgres(connection):
+        connection.execute(text("DROP TABLE IF EXISTS search_documents"))
+
+
+event.listen(Base.metadata, "after_create", create_search_index)
+event.listen(Base.metadata, "before_drop", drop_search_index)
+
+
+def _register_sync(kind: str, model) -> None:
+    def on_upsert(mapper, connection, target):
+        index_document(connection, build_document(kind, target))
+
+    def on_update(mapper, connection, target):
+        attrs = inspect(target).attrs
+        if any(attrs[name].history.has_changes() for name in INDEXED_ATTRIBUTES[kind]):
+            on_upsert(mapper, connection, target)
+
+    def on_delete(mapper, connection, target):
+        remove_document(connection, kind, target.id)
+
+    event.listen(model, "after_insert", on_upsert)
+    event.listen(model, "after_update", on_update)
+    event.listen(model, "after_delete", on_delete)
+
+
+for _kind, _model in SEARCH_KINDS.items():
+    _register_sync(_kind, _model)
+
+
+# Queries
+
+def query_terms(q: str) -> List[str]:
+    return [token.lower() for token in TOKEN_RE.findall(q)]
+
+
+def fts5_match(terms: Sequence[str]) -> str:
+    # Every term must match, the last one as a prefix so partial input finds results
+    parts = [f'"{t}"' for t in terms[:-1]] + [f'"{terms[-1]}"*']
+    return " ".join(parts)
+
+
+def pg_tsquery(terms: Sequence[str]) -> str:
+    return " & ".join(f"{t}:*" for t in terms)
+
+
+async def search_catalog(
+    db: AsyncSession,
+    q: str,
+    kinds: Optional[Sequence[str]] = None,
+    difficulty: Optional[str] = None,
+    target_areas: Optional[Sequence[str]] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Return one page of ranked matches and the total number of matches."""
+    terms = query_terms(q)
+    if not terms:
+        return [], 0
+    target_areas = normalize_areas(target_areas)
+    params: Dict[str, Any] = {"limit": limit, "offset": offset}
+    filters = []
+    if kinds:
+        filters.append("kind IN (" + ", ".join(f":kind_{i}" for i in range(len(kinds))) + ")")
+        params.update({f"kind_{i}": k for i, k in enumerate(kinds)})
+    if difficulty:
+        filters.append("difficulty = :difficulty")
+        params["difficulty"] = difficulty
+
+    if db.bind.dialect.name == "postgresql":
+        params["query"] = pg_tsquery(terms)
+        if target_areas:
+            filters.append("target_areas && CAST(:target_areas AS TEXT[])")
+            params["target_areas"] = target_areas
+        where = " AND ".join(["document @@ query"] + filters)
+        from_clause = "FROM search_index, to_tsquery('english', :query) AS query"
+        page_sql = f"""
+            SELECT kind, item_id, difficulty, title,
+                ts_headline('english', body, query, 'MaxWords={SNIPPET_WORDS}, MinWords=5, StartSel="", StopSel=""') AS snippet,
+                ts_rank_cd(document, query) AS score
+            {from_clause} WHERE {where}
+            ORDER BY score DESC, title LIMIT :limit OFFSET :offset
+        """
+    else:
+        params["query"] = fts5_match(terms)
+        if target_areas:
+            # Any of the requested areas, compared exactly
+            placeholders = ", ".join(f":area_{i}" for i in range(len(target_areas)))
+            filters.append(
+                "EXISTS (SELECT 1 FROM json_each(search_documents.target_areas) "
+                f"WHERE json_each.value IN ({placeholders}))"
+            )
+            params.update({f"area_{i}": a for i, a in enumerate(target_areas)})
+        where = " AND ".join(["search_index MATCH :query"] + filters)
+        from_clause = "FROM search_index JOIN search_documents ON search_documents.id = search_index.rowid"
+        # bm25() is lower-is-better; weight title over body over target areas
+        page_sql = f"""
+            SELECT kind, item_id, difficulty, title,
+                snippet(search_index, 1, '', '', '…', {SNIPPET_WORDS}) AS snippet,
+                -bm25(search_index, 10.0, 1.0, 5.0) AS score
+            {from_clause} WHERE {where}
+            ORDER BY score DESC, title LIMIT :limit OFFSET :offset
+        """
+
+    total = (await db.execute(text(f"SELECT COUNT(*) {from_clause} WHERE {where}"), params)).scalar_one()
+    if total <= offset:
+        return [], total
+    rows = (await db.execute(text(page_sql), params)).mappings().all()
+    return [dict(row) for row in rows], total
@@ -0,0 +1,125 @@
+import os
+import re
+from mimetypes import guess_type
+from typing import Dict, Optional, Tuple
+
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Receive, Scope, Send
+
+# Vite emits content-hashed bundles such as assets/index-B5Qt9EMX.js: the
+# name, a dash, exactly 8 hash characters, then the extension. Unhashed files
+# copied from public/assets (hero-illustration.png) must stay revalidated.
+HASHED_ASSET_RE = re.compile(r"(^|/)assets/[^/]+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Preferred order when the client accepts several encodings
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Parse an Accept-Encoding header, dropping codings explicitly refused with q=0."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding)
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves `.br`/`.gz` siblings produced at build time and
+    sets long-lived cache headers on content-hashed assets.
+
+    Responses are still plain FileResponses, so ETag/Last-Modified conditional
+    requests keep working. This is not zero-copy under the server we ship:
+    uvicorn (and so gunicorn's UvicornWorker) doesn't implement the ASGI
+    `http.response.pathsend` extension, so files are streamed through Python
+    in chunks. Precompression and long-lived caching are what keep asset
+    traffic off the workers; a server with pathsend (e.g. granian) would
+    send the files directly.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # The bundle is immutable once deployed, so sibling lookups are cached
+        self._variants: Dict[str, Dict[str, Tuple[str, os.stat_result]]] = {}
+
+    def _find_variants(self, full_path: str) -> Dict[str, Tuple[str, os.stat_result]]:
+        variants = self._variants.get(full_path)
+        if variants is None:
+            variants = {}
+            for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+                try:
+                    stat_result = os.stat(full_path + suffix)
+                except OSError:
+                    continue
+                variants[encoding] = (full_path + suffix, stat_result)
+            self._variants[full_path] = variants
+        return variants
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        media_type = guess_type(full_path)[0] or "text/plain"
+        cache_control = IMMUTABLE_CACHE_CONTROL if HASHED_ASSET_RE.search(full_path) else REVALIDATE_CACHE_CONTROL
+
+        variants = self._find_variants(full_path)
+        encoding: Optional[str] = None
+        if variants:
+            accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+            for candidate, _ in PRECOMPRESSED_ENCODINGS:
+                if candidate in variants and candidate in accepted:
+                    encoding = candidate
+                    full_path, stat_result = variants[candidate]
+                    break
+
+        response = FileResponse(
+            full_path, status_code=status_code, stat_result=stat_result, media_type=media_type
+        )
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        if variants:
+            response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = cache_control
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class APIGZipMiddleware(GZipMiddleware):
+    """
+    GZip only for API routes. Static assets are already precompressed and
+    compressing them again on the fly would defeat the zero-copy file path.
+    """
+
+    def __init__(self, app, prefix: str = "/api", **kwargs) -> None:
+        super().__init__(app, **kwargs)
+        self.prefix = prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith(self.prefix):
+            await super().__call__(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
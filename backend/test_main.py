@@ -1,8 +1,10 @@
 import pytest
-from httpx import AsyncClient
-from main import app
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+from main import app, init_db
 from database import get_db
 from models_db import Base
+from cache import cache
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 import asyncio
 
@@ -16,16 +18,18 @@ async def override_get_db():
 
 app.dependency_overrides[get_db] = override_get_db
 
-@pytest.fixture(autouse=True)
+@pytest_asyncio.fixture(autouse=True)
 async def setup_db():
     async with engine_test.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
-        await conn.run_sync(Base.metadata.create_all)
+    # Same schema creation and seeding as the startup event
+    await init_db(engine_test)
+    cache.clear()
     yield
 
-@pytest.fixture
+@pytest_asyncio.fixture
 async def client():
-    async with AsyncClient(app=app, base_url="http://test") as ac:
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
         yield ac
 
 @pytest.mark.asyncio
@@ -53,3 +57,262 @@ async def test_get_coach_message(client):
     response = await client.get("/api/coach/message")
     assert response.status_code == 200
     assert "content" in response.json()
+
+@pytest.mark.asyncio
+async def test_precompressed_static_assets(tmp_path):
+    from serving import PrecompressedStaticFiles
+    from fastapi import FastAPI
+    import gzip
+
+    assets = tmp_path / "assets"
+    assets.mkdir()
+    bundle = assets / "index-B5Qt9EMX.js"
+    bundle.write_text("console.log('run');" * 100)
+    (assets / "index-B5Qt9EMX.js.gz").write_bytes(gzip.compress(bundle.read_bytes()))
+    (tmp_path / "index.html").write_text("<html></html>")
+    (assets / "hero-illustration.png").write_bytes(b"png")
+
+    static_app = FastAPI()
+    static_app.mount("/", PrecompressedStaticFiles(directory=tmp_path, html=True))
+    async with AsyncClient(transport=ASGITransport(app=static_app), base_url="http://test") as ac:
+        response = await ac.get("/assets/index-B5Qt9EMX.js", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["content-type"].startswith("text/javascript")
+        assert "immutable" in response.headers["cache-control"]
+        assert response.text == bundle.read_text()
+
+        response = await ac.get("/assets/index-B5Qt9EMX.js", headers={"If-None-Match": response.headers["etag"], "Accept-Encoding": "gzip"})
+        assert response.status_code == 304
+
+        response = await ac.get("/")
+        assert response.headers["cache-control"] == "no-cache"
+
+        # Unhashed files under assets/ are revalidated, not cached forever
+        response = await ac.get("/assets/hero-illustration.png")
+        assert response.headers["cache-control"] == "no-cache"
+
+def test_cache_invalidation():
+    from cache import invalidate
+
+    cache.set("challenges", ["cached"])
+    assert cache.get("challenges") == ["cached"]
+    invalidate("challenges")
+    assert cache.get("challenges") is None
+
+def test_cache_invalidation_across_forked_workers():
+    import multiprocessing
+    from cache import invalidate
+
+    # Workers are forked from the preloaded master, like gunicorn does
+    cache.set("challenges", ["cached"])
+    child = multiprocessing.get_context("fork").Process(target=invalidate, args=("challenges",))
+    child.start()
+    child.join()
+    assert child.exitcode == 0
+    assert cache.get("challenges") is None
+
+def test_cache_is_bounded():
+    from cache import LocalCache
+
+    bounded = LocalCache(max_entries=2)
+    bounded.set("nutrition_tips", ["a"], key="a")
+    bounded.set("nutrition_tips", ["b"], key="b")
+    assert bounded.get("nutrition_tips", key="a") == ["a"]
+    bounded.set("nutrition_tips", ["c"], key="c")
+    # "b" was least recently used
+    assert len(bounded) == 2
+    assert bounded.get("nutrition_tips", key="b") is None
+    assert bounded.get("nutrition_tips", key="a") == ["a"]
+
+    # Expired entries are pruned before live ones are evicted
+    expiring = LocalCache(ttl=-1, max_entries=2)
+    expiring.set("nutrition_tips", ["a"], key="a")
+    expiring.set("nutrition_tips", ["b"], key="b")
+    expiring.ttl = 60
+    expiring.set("nutrition_tips", ["c"], key="c")
+    assert len(expiring) == 1
+
+@pytest.mark.asyncio
+async def test_startup_skips_init_when_master_initialized(monkeypatch):
+    import main
+
+    calls = []
+
+    async def fake_init_db():
+        calls.append(True)
+
+    monkeypatch.setattr(main, "init_db", fake_init_db)
+    monkeypatch.setenv(main.DB_INITIALIZED_ENV, "1")
+    await main.startup()
+    assert calls == []
+
+    monkeypatch.delenv(main.DB_INITIALIZED_ENV)
+    await main.startup()
+    assert calls == [True]
+
+@pytest.mark.asyncio
+async def test_search_catalog(client):
+    from models_db import DBStrengthRoutine, DBNutritionTip
+
+    async with TestingSessionLocal() as session:
+        session.add_all([
+            DBStrengthRoutine(name="Runner Core Blast", duration=20, difficulty="medium",
+                              exercises=[{"name": "Plank"}, {"name": "Dead bug"}], targetAreas=["Core"]),
+            DBStrengthRoutine(name="Leg Power", duration=30, difficulty="hard",
+                              exercises=[{"name": "Squats"}, {"name": "Lunges"}], targetAreas=["Legs"]),
+            DBStrengthRoutine(name="Upper Body Circuit", duration=25, difficulty="medium",
+                              exercises=[{"name": "Push-ups"}, {"name": "Planks"}], targetAreas=["Upper Body"]),
+            DBNutritionTip(category="post-run", title="Protein Recovery", content="Have protein within 30 minutes."),
+        ])
+        await session.commit()
+
+    response = await client.get("/api/search", params={"q": "pla"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 2
+    assert {r["title"] for r in data["results"]} == {"Runner Core Blast", "Upper Body Circuit"}
+
+    # targetAreas matches whole areas exactly, never tokens within them
+    response = await client.get("/api/search", params={"q": "pla", "targetAreas": "body"})
+    assert response.json()["total"] == 0
+    response = await client.get("/api/search", params={"q": "pla", "targetAreas": "Upper Body"})
+    assert [r["title"] for r in response.json()["results"]] == ["Upper Body Circuit"]
+    response = await client.get("/api/search", params={"q": "pla", "targetAreas": ""})
+    assert response.json()["total"] == 2
+
+    response = await client.get("/api/search", params={"q": "squat", "difficulty": "hard", "targetAreas": "legs"})
+    assert [r["title"] for r in response.json()["results"]] == ["Leg Power"]
+
+@pytest.mark.asyncio
+async def test_search_reindexes_only_indexed_changes(client, monkeypatch):
+    import search
+    from models_db import DBWorkout
+
+    indexed = []
+    index_document = search.index_document
+    monkeypatch.setattr(search, "index_document", lambda conn, doc: indexed.append(doc["title"]) or index_document(conn, doc))
+
+    async with TestingSessionLocal() as session:
+        workout = DBWorkout(type="tempo", title="Hill Repeats", description="Short uphill efforts", duration=40)
+        session.add(workout)
+        await session.commit()
+        workout_id = workout.id
+    assert indexed == ["Hill Repeats"]
+
+    response = await client.post(f"/api/workouts/{workout_id}/complete", json={"distance": 8, "duration": 40})
+    assert response.status_code == 200
+    assert indexed == ["Hill Repeats"]
+
+    async with TestingSessionLocal() as session:
+        workout = await session.get(DBWorkout, workout_id)
+        workout.title = "Hill Sprints"
+        await session.commit()
+    assert indexed == ["Hill Repeats", "Hill Sprints"]
+    response = await client.get("/api/search", params={"q": "sprints"})
+    assert [r["title"] for r in response.json()["results"]] == ["Hill Sprints"]
+
+    response = await client.get("/api/search", params={"q": "protein", "types": "strength"})
+    assert response.json()["total"] == 0
+
+    response = await client.get("/api/search", params={"q": "protein", "types": "recipes"})
+    assert response.status_code == 400
+
+def test_token_bucket_rate_limit():
+    from admission import TokenBuckets
+
+    buckets = TokenBuckets(rate=1, burst=2)
+    assert buckets.take("user:u1", now=0) == 0
+    assert buckets.take("user:u1", now=0) == 0
+    assert buckets.take("user:u1", now=0) == pytest.approx(1.0)
+    assert buckets.take("user:u2", now=0) == 0
+    assert buckets.take("user:u1", now=1.5) == 0
+
+@pytest.mark.asyncio
+async def test_admission_sheds_when_queue_deadline_passes():
+    from admission import Lane
+
+    lane = Lane(limit=1, max_queue=1, queue_timeout=0.05)
+    assert await lane.acquire() is None
+    waiter = asyncio.ensure_future(lane.acquire())
+    await asyncio.sleep(0)
+    assert await lane.acquire() == "queue_full"
+    assert await waiter == "timeout"
+    lane.release()
+    assert lane.active == 0 and lane.queued == 0
+
+@pytest.mark.asyncio
+async def test_admission_lane_cancel_after_expiry_keeps_slots():
+    from admission import Lane
+
+    lane = Lane(limit=1, max_queue=2, queue_timeout=10)
+    assert await lane.acquire() is None
+    task = asyncio.ensure_future(lane.acquire())
+    await asyncio.sleep(0)
+    # The deadline fires and the client disconnects before the task resumes
+    lane._expire(lane._waiters[0])
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert lane.active == 1 and lane.queued == 0
+    lane.release()
+    assert lane.active == 0
+
+@pytest.mark.asyncio
+async def test_admission_metrics(client):
+    response = await client.get("/api/metrics/admission")
+    assert response.status_code == 200
+    assert set(response.json()["classes"]) == {"critical", "default", "bulk"}
+    assert "GET /api/search" in response.json()["routes"]
+
+@pytest.mark.asyncio
+async def test_admission_middleware_sheds_with_retry_after():
+    from fastapi import FastAPI, Body
+    from admission import (
+        AdmissionControlMiddleware, AdmissionController, PriorityClass, CRITICAL, DEFAULT, BULK
+    )
+
+    controller = AdmissionController(
+        classes={
+            CRITICAL: PriorityClass(CRITICAL, max_concurrency=4, max_queue=4, queue_timeout=1.0),
+            DEFAULT: PriorityClass(DEFAULT, max_concurrency=1, max_queue=1, queue_timeout=0.05),
+            BULK: PriorityClass(BULK, max_concurrency=4, max_queue=4, queue_timeout=1.0, rate=1, burst=2),
+        },
+        route_limits={},
+    )
+    limited_app = FastAPI()
+    limited_app.add_middleware(AdmissionControlMiddleware, controller=controller)
+
+    @limited_app.get("/api/slow")
+    async def slow():
+        await asyncio.sleep(0.2)
+        return {}
+
+    @limited_app.get("/api/profile/{userId}")
+    async def profile(userId: str):
+        return {"userId": userId}
+
+    @limited_app.post("/api/stress")
+    async def stress(entry: dict = Body(...)):
+        return entry
+
+    async with AsyncClient(transport=ASGITransport(app=limited_app), base_url="http://test") as ac:
+        # One running, one queued past its deadline, one rejected by the full queue
+        responses = await asyncio.gather(*[ac.get("/api/slow") for _ in range(3)], ac.get("/api/profile/u1"))
+        assert sorted(r.status_code for r in responses[:3]) == [200, 503, 503]
+        assert all(r.headers["retry-after"] == "1" for r in responses[:3] if r.status_code == 503)
+        # Critical reads have their own lane
+        assert responses[3].status_code == 200
+
+        # Writes are limited per body userId, and the body still reaches the handler
+        for _ in range(2):
+            response = await ac.post("/api/stress", json={"userId": "u1", "level": 3})
+            assert response.json() == {"userId": "u1", "level": 3}
+        response = await ac.post("/api/stress", json={"userId": "u1", "level": 3})
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) >= 1
+        response = await ac.post("/api/stress", json={"userId": "u2", "level": 3})
+        assert response.status_code == 200
+
+    classes = controller.snapshot()["classes"]
+    assert classes[DEFAULT]["shed"]["timeout"] + classes[DEFAULT]["shed"]["queue_full"] == 2
+    assert classes[BULK]["shed"]["rate_limited"] == 1
@@ -4,6 +4,7 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sess
 from main import app
 from database import get_db
 from models_db import Base
+from cache import cache
 import asyncio
 
 # Test database URL
@@ -23,6 +24,7 @@ async def setup_db():
     async with engine_test.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
+    cache.clear()
     yield
     async with engine_test.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
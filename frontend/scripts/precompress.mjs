@@ -0,0 +1,40 @@
+// Writes .br and .gz siblings next to compressible files in dist/ so the
+// backend can serve them directly instead of compressing on every request.
+import { readdir, readFile, writeFile } from "node:fs/promises";
+import path from "node:path";
+import { fileURLToPath } from "node:url";
+import { brotliCompressSync, gzipSync, constants } from "node:zlib";
+
+const distDir = path.resolve(path.dirname(fileURLToPath(import.meta.url)), "..", "dist");
+const COMPRESSIBLE = /\.(js|mjs|css|html|json|svg|txt|map|xml|ico|webmanifest)$/;
+const MIN_SIZE = 1024;
+
+async function* walk(dir) {
+  for (const entry of await readdir(dir, { withFileTypes: true })) {
+    const full = path.join(dir, entry.name);
+    if (entry.isDirectory()) yield* walk(full);
+    else yield full;
+  }
+}
+
+let count = 0;
+for await (const file of walk(distDir)) {
+  if (!COMPRESSIBLE.test(file)) continue;
+  const data = await readFile(file);
+  if (data.length < MIN_SIZE) continue;
+
+  const br = brotliCompressSync(data, {
+    params: {
+      [constants.BROTLI_PARAM_QUALITY]: constants.BROTLI_MAX_QUALITY,
+      [constants.BROTLI_PARAM_SIZE_HINT]: data.length,
+    },
+  });
+  const gz = gzipSync(data, { level: 9 });
+
+  // Only keep variants that actually save bytes
+  if (br.length < data.length) await writeFile(`${file}.br`, br);
+  if (gz.length < data.length) await writeFile(`${file}.gz`, gz);
+  count++;
+}
+
+console.log(`precompressed ${count} files in ${path.relative(process.cwd(), distDir) || "."}`);